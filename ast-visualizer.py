@@ -1,33 +1,183 @@
 import ast
-import uuid
-import sys
-import re
-import json
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 from io import StringIO
-from graphviz import Digraph
-from typing import Optional, Dict
-from IPython.display import display, Image, clear_output
-import ipywidgets as widgets
+
+# graphviz, IPython and ipywidgets are imported where they are used, so that
+# loading this module (e.g. just for print_ast) stays cheap and works without them
+
+# Characters that must be escaped inside a quoted DOT string
+_DOT_ESCAPE = str.maketrans({'\\': '\\\\', '"': '\\"', '\n': '\\n'})
+
+@lru_cache(maxsize=128)
+def _parse_cached(code):
+    """
+    Parse Python code into an AST, reusing the tree if the same code was parsed before.
+    The returned tree is shared between callers and must not be mutated.
+    Call _parse_cached.cache_clear() to drop all cached trees.
+    """
+    return ast.parse(code)
+
+# Label formatters for node types whose attributes are worth displaying,
+# keyed by node class so a label takes a single dict lookup
+_LABEL_FORMATTERS = {
+    # Name nodes represent variables and function names
+    # id attribute contains the actual name
+    ast.Name: lambda node: f"Name\nid={node.id}",
+    # Constant nodes represent literal values (numbers, strings, etc.)
+    # value attribute contains the actual value
+    ast.Constant: lambda node: f"Constant\nvalue={node.value}",
+    # FunctionDef nodes represent function definitions
+    # name attribute contains the function name
+    ast.FunctionDef: lambda node: f"FunctionDef\nname={node.name}",
+    # arg nodes represent function arguments
+    # arg attribute contains the parameter name
+    ast.arg: lambda node: f"arg\narg={node.arg}",
+}
+
+# DOT graph attributes for each layout quality. 'fast' uses straight edges and
+# caps dot's network simplex iterations for node placement, which keeps layout
+# time down on large trees; 'pretty' is the default Graphviz layout.
+_LAYOUT_ATTRS = {
+    'fast': [
+        '\tgraph [rankdir=TB splines=line nslimit=1 ordering=out]\n',
+        '\tnode [shape=box fontname=Helvetica margin="0.05,0.02"]\n',
+    ],
+    'pretty': [
+        '\tgraph [rankdir=TB]\n',
+    ],
+}
+
+# Fields that only ever hold identifiers, strings, numbers or flags, never AST nodes,
+# per node class name. Walking them can never produce a child node.
+_SCALAR_FIELDS = {
+    'Name': ('id',),
+    'Constant': ('value', 'kind'),
+    'Attribute': ('attr',),
+    'FunctionDef': ('name', 'type_comment'),
+    'AsyncFunctionDef': ('name', 'type_comment'),
+    'ClassDef': ('name',),
+    'Assign': ('type_comment',),
+    'For': ('type_comment',),
+    'AsyncFor': ('type_comment',),
+    'With': ('type_comment',),
+    'AsyncWith': ('type_comment',),
+    'AnnAssign': ('simple',),
+    'ImportFrom': ('module', 'level'),
+    'Global': ('names',),
+    'Nonlocal': ('names',),
+    'FormattedValue': ('conversion',),
+    'comprehension': ('is_async',),
+    'ExceptHandler': ('name',),
+    'arg': ('arg', 'type_comment'),
+    'keyword': ('arg',),
+    'alias': ('name', 'asname'),
+    'MatchSingleton': ('value',),
+    'MatchStar': ('name',),
+    'MatchMapping': ('rest',),
+    'MatchClass': ('kwd_attrs',),
+    'MatchAs': ('name',),
+    'TypeIgnore': ('lineno', 'tag'),
+}
+
+def _build_child_fields(skip_ctx):
+    """
+    Map every AST node class to the fields that can hold child nodes, in reverse
+    order as the graph walk pushes them, leaving out ctx if skip_ctx is set.
+    """
+    child_fields = {}
+    for cls in vars(ast).values():
+        if isinstance(cls, type) and issubclass(cls, ast.AST):
+            skipped = set(_SCALAR_FIELDS.get(cls.__name__, ()))
+            if skip_ctx:
+                skipped.add('ctx')
+            child_fields[cls] = tuple(f for f in reversed(cls._fields) if f not in skipped)
+    return child_fields
+
+# Child fields of each node class, with and without the ctx field
+_CHILD_FIELDS = {False: _build_child_fields(False), True: _build_child_fields(True)}
+
+def _leaf_key(node):
+    """
+    Return a key identifying leaves that look identical in the graph,
+    or None if the node can not share its graph node with others.
+    Name nodes keep their context so that loads and stores stay apart.
+    """
+    if type(node) is ast.Constant:
+        return (ast.Constant, type(node.value), repr(node.value))
+    if type(node) is ast.Name:
+        return (ast.Name, node.id, type(node.ctx))
+    return None
 
 class ASTVisualizer(ast.NodeVisitor):
     """
     A custom AST visitor that creates a visual representation of the Abstract Syntax Tree.
-    Inherits from ast.NodeVisitor which provides the basic traversal algorithm.
+    Inherits from ast.NodeVisitor, but overrides visit with an iterative walk of the tree.
     """
-    def __init__(self):
-        # Initialize a new directed graph using graphviz
-        self.graph = Digraph('AST')
-        # Set graph direction to Top-to-Bottom
-        self.graph.attr(rankdir='TB')
-        # Keep track of the current parent node during traversal
-        self.parent_node = None
+    def __init__(self, dedup_leaves=False, layout_quality='fast', skip_ctx=False, depth_limit=None):
+        """
+        Args:
+            dedup_leaves (bool): Draw identical Constant/Name leaves as one shared graph node
+            layout_quality (str): 'fast' for quick straight-line layouts, 'pretty' for
+                                  the default Graphviz layout
+            skip_ctx (bool): Leave out the Load/Store/Del context nodes
+            depth_limit (int): Deepest level of the tree to draw (the root is level 0),
+                               or None to draw the whole tree
+        """
+        if layout_quality not in _LAYOUT_ATTRS:
+            raise ValueError(f"Unknown layout quality: {layout_quality!r}")
+        # The DOT header sets the graph direction to Top-to-Bottom and the layout attributes
+        self._header = ['digraph AST {\n', *_LAYOUT_ATTRS[layout_quality]]
+        # Nodes and edges are kept in parallel lists and only formatted as DOT
+        # once, when the source is requested
+        self._node_ids = []
+        self._node_labels = []
+        self._edge_parents = []
+        self._edge_children = []
+        # Escaped labels pooled by raw label, so repeated labels such as "Load"
+        # are escaped once and share one string object
+        self._escaped_labels = {}
+        # Counter used to hand out node IDs
+        self._counter = 0
+        # IDs of already drawn shareable leaves, keyed by _leaf_key
+        self.dedup_leaves = dedup_leaves
+        self._leaf_ids = {}
+        # Parts of the tree left out of the graph
+        self.skip_ctx = skip_ctx
+        self.depth_limit = depth_limit
+    
+    def source(self):
+        """
+        Return the DOT source of the graph built so far.
+        
+        Returns:
+            str: The complete DOT source, ready to be passed to Graphviz
+        """
+        nodes = ''.join(f'\t{node_id} [label="{label}"]\n'
+                        for node_id, label in zip(self._node_ids, self._node_labels))
+        edges = ''.join(f'\t{parent_id} -> {child_id}\n'
+                        for parent_id, child_id in zip(self._edge_parents, self._edge_children))
+        return ''.join(self._header) + nodes + edges + '}\n'
+    
+    @property
+    def graph(self):
+        """The graph built so far, as a graphviz.Source that can be piped or rendered."""
+        from graphviz import Source
+        return Source(self.source())
     
     def get_node_id(self):
         """
         Generate a unique identifier for each node in the graph.
         This ensures no two nodes have the same ID, even if they represent similar code elements.
+        IDs only need to be unique within one graph, so a simple counter is enough.
         """
-        return str(uuid.uuid4())
+        self._counter += 1
+        return str(self._counter)
     
     def get_node_label(self, node):
         """
@@ -40,31 +190,12 @@ class ASTVisualizer(ast.NodeVisitor):
         Returns:
             str: A formatted label showing the node type and relevant attributes
         """
-        node_type = type(node).__name__
-        
-        # Handle different types of nodes with their specific attributes
-        if isinstance(node, ast.Name):
-            # Name nodes represent variables and function names
-            # id attribute contains the actual name
-            return f"{node_type}\nid={node.id}"
-        elif isinstance(node, ast.Constant):
-            # Constant nodes represent literal values (numbers, strings, etc.)
-            # value attribute contains the actual value
-            return f"{node_type}\nvalue={node.value}"
-        elif isinstance(node, ast.FunctionDef):
-            # FunctionDef nodes represent function definitions
-            # name attribute contains the function name
-            return f"{node_type}\nname={node.name}"
-        elif isinstance(node, ast.arg):
-            # arg nodes represent function arguments
-            # arg attribute contains the parameter name
-            return f"{node_type}\narg={node.arg}"
-        elif isinstance(node, ast.operator):
-            # operator nodes represent mathematical or logical operations
-            return node_type
-        else:
-            # For all other nodes, just show their type
-            return node_type
+        # Node types with relevant attributes have their own formatter,
+        # all other nodes (operators included) just show their type
+        formatter = _LABEL_FORMATTERS.get(type(node))
+        if formatter is not None:
+            return formatter(node)
+        return type(node).__name__
     
     def add_edge(self, parent_id, node):
         """
@@ -81,79 +212,207 @@ class ASTVisualizer(ast.NodeVisitor):
         # Generate unique ID for this node
         node_id = self.get_node_id()
         # Add the node to the graph with its label
-        self.graph.node(node_id, self.get_node_label(node))
+        label = self.get_node_label(node)
+        escaped = self._escaped_labels.get(label)
+        if escaped is None:
+            escaped = self._escaped_labels[label] = label.translate(_DOT_ESCAPE)
+        self._node_ids.append(node_id)
+        self._node_labels.append(escaped)
         # If this node has a parent, connect them with an edge
-        if parent_id:
-            self.graph.edge(parent_id, node_id)
+        if parent_id is not None:
+            self._edge_parents.append(parent_id)
+            self._edge_children.append(node_id)
         return node_id
     
-    def generic_visit(self, node):
+    def walk(self, root):
         """
-        Visit a node in the AST and create its visual representation.
-        This method is called for every node in the tree during traversal.
+        Walk the AST and create its visual representation.
         
-        The visiting process:
-        1. Adds the current node to the graph
-        2. Recursively visits all children of the node
-        3. Maintains proper parent-child relationships
+        The tree is walked with an explicit stack instead of recursive visit calls:
+        1. Pops a (node, parent ID) pair and adds the node to the graph
+        2. Pushes all children of the node, paired with the new node's ID
+        3. Children are pushed in reverse so they are drawn in source order
+        
+        With dedup_leaves, a leaf identical to one already drawn is only
+        connected to its new parent and its children are not drawn again.
+        With skip_ctx, ctx fields are not walked, and with depth_limit the
+        children of nodes at the limit are not walked.
         
         Args:
-            node (ast.AST): The node being visited
+            root (ast.AST): The root node of the tree to walk
         """
-        parent_id = self.parent_node
-        
-        # Add this node and get its ID
-        current_parent = self.add_edge(parent_id, node)
-        # Save the previous parent to restore after visiting children
-        old_parent = self.parent_node
-        
-        # Set current node as parent for its children
-        self.parent_node = current_parent
+        child_fields = _CHILD_FIELDS[bool(self.skip_ctx)]
+        depth_limit = self.depth_limit
+        stack = [(root, None, 0)]
+        while stack:
+            node, parent_id, depth = stack.pop()
+            
+            key = _leaf_key(node) if self.dedup_leaves else None
+            if key is not None:
+                shared_id = self._leaf_ids.get(key)
+                if shared_id is not None:
+                    self._edge_parents.append(parent_id)
+                    self._edge_children.append(shared_id)
+                    continue
+            
+            node_id = self.add_edge(parent_id, node)
+            if key is not None:
+                self._leaf_ids[key] = node_id
+            
+            if depth_limit is not None and depth >= depth_limit:
+                continue
+            depth += 1
+            
+            # Read the fields that can hold children straight from the instance dict
+            # instead of going through the ast.iter_fields generator; missing optional
+            # fields come back as None. Fields and list items are visited back to front
+            # and pushed directly, so the last child pushed is the first one in source order
+            fields = child_fields.get(type(node))
+            if fields is None:
+                fields = node._fields[::-1]
+            values = node.__dict__
+            for field in fields:
+                value = values.get(field)
+                if value is None:
+                    continue
+                if type(value) is list:
+                    # Some fields contain lists of nodes (e.g., function body);
+                    # empty ones (decorator_list, orelse, keywords, ...) are common
+                    if not value:
+                        continue
+                    for item in reversed(value):
+                        if isinstance(item, ast.AST):
+                            stack.append((item, node_id, depth))
+                elif isinstance(value, ast.AST):
+                    # Single node fields
+                    stack.append((value, node_id, depth))
+    
+    def visit(self, node):
+        """Build the graph for the tree rooted at node (see walk)."""
+        self.walk(node)
+
+# Rendered SVG bytes keyed by a hash of the source code, least recently used first
+# Guarded by a lock, since renders may run on several threads at once
+_RENDER_CACHE = OrderedDict()
+_RENDER_CACHE_SIZE = 64
+_RENDER_CACHE_LOCK = threading.Lock()
+
+def _write_sidecar(path, data):
+    """
+    Write a cached render to disk atomically.
+    The data goes to a temporary file in the same directory that then replaces path,
+    so an interrupted write never leaves a truncated file behind to be served later.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def _render_svg(code, cache_dir=None, dedup_leaves=False, layout_quality='fast',
+                skip_ctx=False, depth_limit=None):
+    """
+    Render the AST of the given code to SVG bytes.
+    Rendering runs the Graphviz `dot` binary, so results are cached by source hash
+    and unchanged snippets are only rendered once.
+    
+    Args:
+        code (str): Python source code to visualize
+        cache_dir (str): Optional directory used to persist renders across sessions
+        dedup_leaves (bool): Draw identical leaves as one shared graph node
+        layout_quality (str): 'fast' or 'pretty' Graphviz layout
+        skip_ctx (bool): Leave out the Load/Store/Del context nodes
+        depth_limit (int): Deepest level of the tree to draw, or None for all of it
+    
+    Returns:
+        bytes: The rendered SVG image
+    """
+    # Rendering options are hashed first; their repr never contains a newline
+    options = (dedup_leaves, layout_quality, skip_ctx, depth_limit)
+    key = hashlib.blake2b(f"{options!r}\n{code}".encode()).digest()
+    with _RENDER_CACHE_LOCK:
+        svg = _RENDER_CACHE.get(key)
+        if svg is not None:
+            _RENDER_CACHE.move_to_end(key)
+    if svg is not None:
+        return svg
+    
+    path = os.path.join(cache_dir, f"{key.hex()}.svg") if cache_dir else None
+    if path:
+        try:
+            with open(path, 'rb') as f:
+                svg = f.read()
+        except OSError:
+            # No readable sidecar, render it below
+            pass
+    rendered = svg is None
+    if rendered:
+        # Parse the code string into an AST
+        tree = _parse_cached(code)
         
-        # Visit all child nodes
-        # ast.iter_fields yields tuples of (field_name, field_value)
-        for field, value in ast.iter_fields(node):
-            if isinstance(value, list):
-                # Some fields contain lists of nodes (e.g., function body)
-                for item in value:
-                    if isinstance(item, ast.AST):
-                        self.visit(item)
-            elif isinstance(value, ast.AST):
-                # Single node fields
-                self.visit(value)
+        # Create visualizer and traverse the tree
+        visualizer = ASTVisualizer(dedup_leaves=dedup_leaves, layout_quality=layout_quality,
+                                   skip_ctx=skip_ctx, depth_limit=depth_limit)
+        visualizer.walk(tree)
         
-        # Restore the previous parent for correct sibling relationships
-        self.parent_node = old_parent
+        # Render in memory; dot reads the graph from stdin and writes the SVG to stdout
+        svg = visualizer.graph.pipe(format='svg')
+    
+    with _RENDER_CACHE_LOCK:
+        _RENDER_CACHE[key] = svg
+        if len(_RENDER_CACHE) > _RENDER_CACHE_SIZE:
+            _RENDER_CACHE.popitem(last=False)
+    if rendered and path:
+        try:
+            _write_sidecar(path, svg)
+        except OSError:
+            # Persisting is best effort, the render is still cached in memory
+            pass
+    return svg
 
-def visualize_ast(code):
+def visualize_ast(code, cache_dir=None, dedup_leaves=False, layout_quality='fast',
+                  skip_ctx=False, depth_limit=None):
     """
     Parse Python code and create a visual representation of its AST.
     
     Args:
         code (str): Python source code to visualize
+        cache_dir (str): Optional directory used to persist renders across sessions
+        dedup_leaves (bool): Draw identical Constant/Name leaves as one shared graph node
+        layout_quality (str): 'fast' for quick straight-line layouts, 'pretty' for
+                              the default Graphviz layout
+        skip_ctx (bool): Leave out the Load/Store/Del context nodes
+        depth_limit (int): Deepest level of the tree to draw (the root is level 0),
+                           or None to draw the whole tree
     
     Returns:
-        Image or str: Either the visualization as an Image object,
+        SVG or str: Either the visualization as an SVG object,
                      or an error message if parsing fails
     """
+    from IPython.display import SVG
     try:
-        # Parse the code string into an AST
-        tree = ast.parse(code)
-        
-        # Create visualizer and traverse the tree
-        visualizer = ASTVisualizer()
-        visualizer.visit(tree)
-        
-        # Generate and display the visualization
-        visualizer.graph.render('ast_output', format='png', cleanup=True)
-        return Image('ast_output.png')
+        return SVG(data=_render_svg(code, cache_dir, dedup_leaves=dedup_leaves,
+                                    layout_quality=layout_quality, skip_ctx=skip_ctx,
+                                    depth_limit=depth_limit))
     except SyntaxError as e:
         return f"Syntax Error: {str(e)}"
     except Exception as e:
         return f"Error: {str(e)}"
 
 class InteractiveASTVisualizer:
+    # Renders run here so the kernel stays responsive while dot is working
+    _executor = ThreadPoolExecutor(max_workers=2)
+    # Number of recent renders each widget keeps for redisplay
+    _RECENT_SIZE = 16
+    
     def __init__(self):
+        import ipywidgets as widgets
+        
         # Create widgets
         self.code_input = widgets.Textarea(
             value='',
@@ -167,6 +426,18 @@ class InteractiveASTVisualizer:
             layout=widgets.Layout(width='200px')
         )
         
+        self.dedup_checkbox = widgets.Checkbox(
+            value=False,
+            description='Share identical leaves',
+            indent=False
+        )
+        
+        self.skip_ctx_checkbox = widgets.Checkbox(
+            value=False,
+            description='Hide contexts',
+            indent=False
+        )
+        
         self.output = widgets.Output()
         
         # Example selector
@@ -224,16 +495,56 @@ else:
 result = calculate_factorial(5)'''
         }
         self.code_input.value = self.examples['variable']
+        
+        # Recently rendered inputs and their images, least recently used first.
+        # Going back to one of them redisplays the image without rendering.
+        # Renders finish on the executor thread, so access goes through a lock
+        self._recent = OrderedDict()
+        self._recent_lock = threading.Lock()
     
     def _on_visualize_click(self, b):
         """Handle visualize button click"""
-        with self.output:
-            clear_output()
-            result = visualize_ast(self.code_input.value)
-            if isinstance(result, str):  # Error message
-                print(result)
-            else:  # Image
-                display(result)
+        key = (self.code_input.value, self.dedup_checkbox.value, self.skip_ctx_checkbox.value)
+        with self._recent_lock:
+            image = self._recent.get(key)
+            if image is not None:
+                self._recent.move_to_end(key)
+        if image is not None:
+            # This input was rendered recently
+            from IPython.display import display, clear_output
+            with self.output:
+                clear_output()
+                display(image)
+            return
+        
+        # Ignore further clicks until this render is done
+        self.visualize_button.disabled = True
+        self.output.outputs = ()
+        future = self._executor.submit(
+            visualize_ast, self.code_input.value,
+            dedup_leaves=self.dedup_checkbox.value, skip_ctx=self.skip_ctx_checkbox.value
+        )
+        future.add_done_callback(partial(self._on_render_done, key))
+    
+    def _on_render_done(self, key, future):
+        """Show the result of a background render; runs on the executor thread"""
+        try:
+            result = future.result()
+            # Write to the output widget directly, capturing with `with self.output`
+            # is not reliable outside the kernel's main thread
+            with self.output.hold_trait_notifications():
+                self.output.outputs = ()
+                if isinstance(result, str):  # Error message
+                    self.output.append_stdout(result + '\n')
+                else:  # SVG
+                    with self._recent_lock:
+                        self._recent[key] = result
+                        if len(self._recent) > self._RECENT_SIZE:
+                            self._recent.popitem(last=False)
+                    self.output.append_display_data(result)
+        finally:
+            # Re-enable the button even if the render or the output update failed
+            self.visualize_button.disabled = False
     
     def _on_load_example_click(self, b):
         """Handle load example button click"""
@@ -242,12 +553,15 @@ result = calculate_factorial(5)'''
     
     def display(self):
         """Display the interactive interface"""
+        import ipywidgets as widgets
+        from IPython.display import display
+        
         # Create layout
         example_controls = widgets.HBox([self.example_dropdown, self.load_example_button])
         controls = widgets.VBox([
             example_controls,
             self.code_input,
-            self.visualize_button,
+            widgets.HBox([self.visualize_button, self.dedup_checkbox, self.skip_ctx_checkbox]),
             self.output
         ])
         display(controls)
@@ -320,6 +634,7 @@ NODE_CATEGORIES = {
 
 # Node type explanations
 NODE_EXPLANATIONS = {
+    'Module': 'Root node of the AST',
     'FunctionDef': 'Function definition (def keyword)',
     'ClassDef': 'Class definition (class keyword)',
     'If': 'If statement for conditional execution',
@@ -333,58 +648,17 @@ NODE_EXPLANATIONS = {
     'BinOp': 'Binary operation (+, -, *, etc.)',
     'Compare': 'Comparison operation (==, !=, etc.)',
     'Attribute': 'Attribute access (obj.attr)',
-}
-
-#################
-
-class Colors:
-    RESET = '\033[0m'
-    STATEMENT = '\033[92m'      # bright green
-    EXPRESSION = '\033[94m'     # bright blue
-    CONTROL_FLOW = '\033[95m'   # bright magenta
-    DEFINITION = '\033[96m'     # bright cyan
-    OPERATOR = '\033[93m'       # bright yellow
-    LITERAL = '\033[91m'        # bright red
-    ATTRIBUTE = '\033[97m'      # bright white
-
-NODE_CATEGORIES = {
-    'FunctionDef': 'DEFINITION',
-    'ClassDef': 'DEFINITION',
-    'AsyncFunctionDef': 'DEFINITION',
-    'If': 'CONTROL_FLOW',
-    'For': 'CONTROL_FLOW',
-    'While': 'CONTROL_FLOW',
-    'Call': 'EXPRESSION',
-    'Name': 'EXPRESSION',
-    'Attribute': 'EXPRESSION',
-    'Constant': 'LITERAL',
-    'Return': 'STATEMENT',
-    'Assign': 'STATEMENT',
-    'Add': 'OPERATOR',
-    'Sub': 'OPERATOR',
-    'Mult': 'OPERATOR',
-}
-
-NODE_EXPLANATIONS = {
-    'Module': 'Root node of the AST',
-    'FunctionDef': 'Function definition (def keyword)',
-    'ClassDef': 'Class definition (class keyword)',
-    'If': 'If statement for conditional execution',
-    'For': 'For loop for iteration',
-    'Call': 'Function or method call',
-    'Name': 'Variable or function name',
-    'Constant': 'Literal value (number, string, etc.)',
-    'Return': 'Return statement',
-    'Assign': 'Assignment statement (=)',
     'arguments': 'Function arguments definition',
     'arg': 'Single function argument',
 }
 
+# ANSI color of each categorized node type, resolved once instead of per call
+_COLOR_PREFIX = {node_type: getattr(Colors, category) for node_type, category in NODE_CATEGORIES.items()}
+_RESET = Colors.RESET
+
 def colorize(node_type: str, text: str) -> str:
     """Add color to node text based on its type."""
-    category = NODE_CATEGORIES.get(node_type, 'ATTRIBUTE')
-    color = getattr(Colors, category)
-    return f"{color}{text}{Colors.RESET}"
+    return _COLOR_PREFIX.get(node_type, Colors.ATTRIBUTE) + text + _RESET
 
 def get_explanation(node_type: str, show_explanations: bool) -> str:
     """Get explanation for node type if enabled."""
@@ -395,6 +669,47 @@ def get_explanation(node_type: str, show_explanations: bool) -> str:
         return f' # {explanation}'
     return ''
 
+# Color and explanation suffix of every node type listed above, fused into one
+# table so that both are found with a single lookup
+_NODE_STYLES = {
+    node_type: (
+        _COLOR_PREFIX.get(node_type, Colors.ATTRIBUTE),
+        f' # {NODE_EXPLANATIONS[node_type]}' if node_type in NODE_EXPLANATIONS else ''
+    )
+    for node_type in {**NODE_CATEGORIES, **NODE_EXPLANATIONS}
+}
+_DEFAULT_STYLE = (Colors.ATTRIBUTE, '')
+
+@lru_cache(maxsize=None)
+def _node_head(node_type: str, show_explanations: bool) -> str:
+    """Colored node type followed by its explanation, computed once per node type."""
+    color, explanation = _NODE_STYLES.get(node_type, _DEFAULT_STYLE)
+    head = color + node_type + _RESET
+    return head + explanation if show_explanations else head
+
+@lru_cache(maxsize=None)
+def _class_head(node_class: type, show_explanations: bool) -> str:
+    """Same as _node_head, keyed by the AST class so callers need not look up its name."""
+    return _node_head(node_class.__name__, show_explanations)
+
+# Indentation strings for each nesting level, with and without a leading newline.
+# They are grown on demand so that each one is only built once.
+_INDENTS = [""]
+_NEWLINE_INDENTS = ["\n"]
+
+def _ind(level: int) -> str:
+    """Return the indentation string for the given nesting level."""
+    while len(_INDENTS) <= level:
+        _INDENTS.append("  " * len(_INDENTS))
+        _NEWLINE_INDENTS.append("\n" + _INDENTS[-1])
+    return _INDENTS[level]
+
+def _nl_ind(level: int) -> str:
+    """Return a newline followed by the indentation string for the given nesting level."""
+    if level >= len(_NEWLINE_INDENTS):
+        _ind(level)
+    return _NEWLINE_INDENTS[level]
+
 def ast_to_dict(node):
     """Convert AST node to dictionary representation."""
     if isinstance(node, ast.AST):
@@ -409,15 +724,14 @@ def ast_to_dict(node):
 
 def prettify_dict(node_dict: dict, indent_level: int = 0, show_explanations: bool = False) -> str:
     """Create a prettified string representation of the AST dictionary."""
-    indent = "  " * indent_level
+    indent = _ind(indent_level)
+    field_indent = _ind(indent_level + 1)
+    item_indent = _ind(indent_level + 2)
     node_type = node_dict['type']
     fields = node_dict['fields']
     
     # Start the node representation
-    result = [colorize(node_type, node_type)]
-    explanation = get_explanation(node_type, show_explanations)
-    if explanation:
-        result[0] += explanation
+    result = [_node_head(node_type, show_explanations)]
     
     # If there are no fields, return just the node type
     if not fields:
@@ -428,7 +742,7 @@ def prettify_dict(node_dict: dict, indent_level: int = 0, show_explanations: boo
     # Process fields
     field_strs = []
     for name, value in fields.items():
-        field_str = indent + "  "  # Extra indent for fields
+        field_str = field_indent  # Extra indent for fields
         
         # Handle different types of values
         if isinstance(value, dict):
@@ -441,7 +755,7 @@ def prettify_dict(node_dict: dict, indent_level: int = 0, show_explanations: boo
                         if isinstance(item, dict) 
                         else repr(item) 
                         for item in value]
-                field_str += f"{name}=[\n{indent}    " + f",\n{indent}    ".join(items) + "\n" + indent + "  ]"
+                field_str += f"{name}=[\n{item_indent}" + f",\n{item_indent}".join(items) + f"\n{field_indent}]"
         else:
             field_str += f"{name}={repr(value)}"
         field_strs.append(field_str)
@@ -454,8 +768,67 @@ def prettify_dict(node_dict: dict, indent_level: int = 0, show_explanations: boo
     
     return "".join(result)
 
+def _emit_ast(node: ast.AST, indent_level: int, show_explanations: bool, write) -> None:
+    """Write the prettified representation of an AST node piece by piece using write."""
+    # Start the node representation
+    write(_class_head(type(node), show_explanations))
+    
+    # If there are no fields, write just the node type
+    fields = list(ast.iter_fields(node))
+    if not fields:
+        return
+    
+    # Process fields; fields get an extra indent, list items two
+    field_indent = _nl_ind(indent_level + 1)
+    item_indent = _nl_ind(indent_level + 2)
+    separator = "("
+    for name, value in fields:
+        write(separator)
+        separator = ","
+        write(field_indent)
+        write(name)
+        write("=")
+        
+        # Handle different types of values
+        if isinstance(value, ast.AST):
+            _emit_ast(value, indent_level + 1, show_explanations, write)
+        elif isinstance(value, list):
+            if not value:
+                write("[]")
+            else:
+                item_separator = "["
+                for item in value:
+                    write(item_separator)
+                    item_separator = ","
+                    write(item_indent)
+                    if isinstance(item, ast.AST):
+                        _emit_ast(item, indent_level + 2, show_explanations, write)
+                    else:
+                        write(repr(item))
+                write(field_indent)
+                write("]")
+        else:
+            write(repr(value))
+    
+    write(_nl_ind(indent_level))
+    write(")")
+
+def prettify_ast(node: ast.AST, indent_level: int = 0, show_explanations: bool = False) -> str:
+    """
+    Create a prettified string representation of an AST node.
+    Walks the tree directly, producing the same output as prettify_dict(ast_to_dict(node))
+    without building the intermediate dictionary. All pieces are streamed into one
+    StringIO buffer, instead of joining a new string at every level.
+    """
+    buf = StringIO()
+    _emit_ast(node, indent_level, show_explanations, buf.write)
+    return buf.getvalue()
+
 def print_ast(code: str, show_explanations: bool = False):
-    """Parse and print a prettified AST for the given code."""
-    tree = ast.parse(code)
-    dict_tree = ast_to_dict(tree)
-    print(prettify_dict(dict_tree, show_explanations=show_explanations))
+    """
+    Parse and print a prettified AST for the given code.
+    The output is built in one buffer and printed with a single write, since stdout
+    writes are costly per call (notably under ipykernel).
+    """
+    tree = _parse_cached(code)
+    print(prettify_ast(tree, show_explanations=show_explanations))
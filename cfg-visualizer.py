@@ -1,53 +1,65 @@
-import re
-from collections import defaultdict
-from dataclasses import dataclass, field
-from typing import List, Tuple, Dict, Optional, Set, Union
-import ipywidgets as widgets
-from IPython.display import display, clear_output
-import graphviz
+# DOT header shared by all control flow graphs
+_CFG_HEADER = (
+    '// Control Flow Graph\n'
+    'digraph {\n'
+    '\tgraph [fontsize=16 label="Control Flow Graph" labelloc=t rankdir=TB size="10,8"]\n'
+    '\tnode [color=darkblue fillcolor=lightblue fontsize=10 shape=box style=filled]\n'
+    '\tedge [color=gray fontsize=10]\n'
+)
+
+# Escapes HTML special characters in node content and turns newlines into
+# HTML breaks, all in a single pass over the string
+_HTML_ESCAPE = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;', '\n': '<br/>'})
+
+# Extra node attributes for the special states; regular nodes use the defaults
+_SPECIAL_NODE_ATTRS = {
+    # Initial state as a circle with green color
+    "initial": ' shape=circle fillcolor=lightgreen color=darkgreen',
+    # Terminal state as a doublecircle with red color
+    "terminal": ' shape=doublecircle fillcolor=mistyrose color=darkred',
+}
+
+def _quote(text):
+    """Quote a string for use as a DOT ID or attribute value."""
+    return '"' + text.replace('"', '\\"') + '"'
 
 def draw_cfg(cfg):
     """
     Draw the control flow graph using Graphviz.
 
+    The DOT source is written out directly rather than through Digraph.node/edge,
+    so large graphs do not pay for graphviz's per-call quoting and bookkeeping.
+
     Args:
         cfg (ControlFlowGraph): Control flow graph object with nodes and edges
 
     Returns:
-        graphviz.Digraph: The generated graph object
+        None: The graph is shown with IPython's display instead, so it is not
+              displayed a second time when called as the last line of a cell
     """
-    dot = graphviz.Digraph(comment='Control Flow Graph')
-    dot.attr(rankdir='TB', size='10,8', label='Control Flow Graph', labelloc='t', fontsize='16')
-    dot.attr('node', shape='box', style='filled', fillcolor='lightblue', color='darkblue', fontsize='10')
-    dot.attr('edge', color='gray', fontsize='10')
+    import graphviz
+    from IPython.display import display
+
+    lines = [_CFG_HEADER]
 
     # Add nodes
     for node in cfg.nodes:
-        # Escape HTML in the content to ensure proper rendering
-        content = node.content.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-        # Replace newlines with HTML breaks for proper display
-        content = content.replace('\n', '<br/>')
-        node_id = str(node.id)
-
+        # Escape HTML in the content and replace newlines with HTML breaks for proper display
+        content = node.content.translate(_HTML_ESCAPE)
         # Special styling for initial and terminal states
-        if node.special == "initial":
-            # Initial state as a circle with green color
-            dot.node(node_id, f"<{content}>", shape='circle', fillcolor='lightgreen', color='darkgreen')
-        elif node.special == "terminal":
-            # Terminal state as a doublecircle with red color
-            dot.node(node_id, f"<{content}>", shape='doublecircle', fillcolor='mistyrose', color='darkred')
-        else:
-            # Regular node
-            dot.node(node_id, f"<{content}>")
+        attrs = _SPECIAL_NODE_ATTRS.get(node.special, '')
+        lines.append(f'\t{_quote(str(node.id))} [label=<{content}>{attrs}]\n')
 
     # Add edges
     for edge in cfg.edges:
-        source = str(edge.source)
-        target = str(edge.target)
+        source = _quote(str(edge.source))
+        target = _quote(str(edge.target))
         condition = edge.condition
         if condition:
-            dot.edge(source, target, label=condition)
+            lines.append(f'\t{source} -> {target} [label={_quote(condition)}]\n')
         else:
-            dot.edge(source, target)
+            lines.append(f'\t{source} -> {target}\n')
 
+    lines.append('}\n')
+    dot = graphviz.Source(''.join(lines))
     display(dot)